@@ -1,4 +1,3 @@
 import utils
 import config
-import time,random,os
-from tqdm import tqdm
\ No newline at end of file
+import os
\ No newline at end of file
@@ -1,45 +1,46 @@
 from . import *
+from concurrent.futures import ThreadPoolExecutor
 
 def down_book(it:str) -> bool:
     ozj,chapter,name=utils.down_init(it)
     if not name:
         return False
     book_json_path:str=os.path.join(config.bookstore_dir,name+'.json')
-    tcs,cs=0,0
-    pbar=tqdm(total=len(chapter))
-    for title,idx in chapter.items():
-        if utils.check_redown(title,ozj):
-            tqdm.write(f'下载 {title}')
-            chapter[title],st=utils.down_text(idx)
-            time.sleep(random.randint(config.config['delay'][0],config.config['delay'][1])/1000)
-            tcs,cs=utils.update_save(st,tcs,cs,book_json_path,chapter)
-        else:
-            chapter[title]=ozj[title]
-        pbar.update(1)
-    utils.savejson(book_json_path,chapter)
+    utils.down_chapters(chapter,ozj,book_json_path)
+    utils.finish_save(book_json_path,chapter)
 
+    # 段首占位符只拼接一次；kg 为 0 时正文原样写入
     fg='\n'+config.config['kgf']*config.config['kg']
+    if config.config['kg']==0:
+        indent=lambda text:text
+    else:
+        indent=lambda text:text.replace('\n',fg)
     if config.config['save_mode']==1:
         text_file_path=os.path.join(config.save_path,name+'.txt')
-        with open(text_file_path,'w',encoding='UTF-8') as text_file:
-            for chapter_title in chapter:
-                text_file.write('\n'+chapter_title+fg)
-                if config.config['kg']==0:
-                    text_file.write(chapter[chapter_title]+'\n')
-                else:
-                    text_file.write(chapter[chapter_title].replace('\n',fg)+'\n')
+        # 大缓冲区，每章只写入一次；保留文本模式以维持系统换行符
+        with open(text_file_path,'w',encoding='UTF-8',buffering=1<<20) as text_file:
+            for chapter_title,content in chapter.items():
+                text_file.write(f'\n{chapter_title}{fg}{indent(content)}\n')
     elif config.config['save_mode']==2:
         text_dir_path=os.path.join(config.save_path,name)
         if not os.path.exists(text_dir_path):
             os.makedirs(text_dir_path)
+
+        # 清理后文件名相同的章节（不区分大小写）归为一组，组内按顺序写入，后者覆盖前者
+        groups:dict[str,list[str]]={}
         for chapter_title in chapter:
-            text_file_path=os.path.join(text_dir_path,utils.sanitize_filename(chapter_title)+'.txt')
-            with open(text_file_path,'w',encoding='UTF-8') as text_file:
-                text_file.write(fg)
-                if config.config['kg']==0:
-                    text_file.write(chapter[chapter_title]+'\n')
-                else:
-                    text_file.write(chapter[chapter_title].replace('\n',fg)+'\n')
+            groups.setdefault(utils.sanitize_filename(chapter_title).casefold(),[]).append(chapter_title)
+
+        def write_chapters(titles:list[str]) -> None:
+            for chapter_title in titles:
+                text_file_path=os.path.join(text_dir_path,utils.sanitize_filename(chapter_title)+'.txt')
+                with open(text_file_path,'w',encoding='UTF-8') as text_file:
+                    text_file.write(fg)
+                    text_file.write(indent(chapter[chapter_title])+'\n')
+
+        # 大量小文件的开销主要在文件系统元数据操作，多线程并行写入
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(write_chapters,groups.values()))
 
     else:
         print('保存模式出错！')
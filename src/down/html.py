@@ -14,18 +14,12 @@ def down_book_html(it: str) -> bool:
 
     book_json_path:str=os.path.join(config.bookstore_dir,name+'.json')
 
-    tcs,cs=0,0
-    pbar=tqdm(total=len(chapter))
-    for title,idx in chapter.items():
-        if utils.check_redown(title,ozj):
-            tqdm.write(f'下载 {title}')
-            chapter[title],st=utils.down_text(idx)
-            time.sleep(random.randint(config.config['delay'][0],config.config['delay'][1])/1000)
-            tcs,cs=utils.update_save(st,tcs,cs,book_json_path,chapter)
-            with open(os.path.join(book_dir,f"{title}.html"),"w",encoding='UTF-8') as chapter_file:
-                chapter_file.write(html.get_chapter_htmlcontent(title,chapter[title],chapter))
-        else:
-            chapter[title]=ozj[title]
-        pbar.update(1)
-    utils.savejson(book_json_path,chapter)
+    utils.down_chapters(chapter,ozj,book_json_path)
+    utils.finish_save(book_json_path,chapter)
+
+    titles=list(chapter)
+    for i,title in enumerate(titles):
+        next_title=titles[i+1] if i+1<len(titles) else ''
+        with open(os.path.join(book_dir,f"{title}.html"),"w",encoding='UTF-8') as chapter_file:
+            chapter_file.write(html.get_chapter_htmlcontent(title,chapter[title],next_title))
     return True
@@ -8,20 +8,12 @@ def down_book_md(it: str) -> bool:
     book_json_path=os.path.join(config.bookstore_dir,name+'.json')
     md_content=f"# {name}\n\n"
 
-    tcs,cs=0,0
-    pbar=tqdm(total=len(chapter))
-    for title,idx in chapter.items():
-        if utils.check_redown(title,ozj):
-            tqdm.write(f'下载 {title}')
-            content,st=utils.down_text(idx)
-            time.sleep(random.randint(config.config['delay'][0],config.config['delay'][1])/1000)
-            tcs,cs=utils.update_save(st,tcs,cs,book_json_path,chapter)
-            content=content.replace('\n','  \n')
-            md_content+=f"## {title}\n\n{content}\n\n"
-        else:
-            chapter[title]=ozj[title]
-        pbar.update(1)
-    utils.savejson(book_json_path,chapter)
+    utils.down_chapters(chapter,ozj,book_json_path)
+    utils.finish_save(book_json_path,chapter)
+
+    for title,content in chapter.items():
+        content=content.replace('\n','  \n')
+        md_content+=f"## {title}\n\n{content}\n\n"
     # 保存为Markdown文件
     md_file_path=os.path.join(config.save_path,f'{name}.md')
     with open(md_file_path,'w',encoding='utf-8') as md_file:
@@ -53,22 +53,13 @@ def down_book_pdf(it: str) -> bool:
 
     # 添加书名
     story = [Paragraph(name, title_style), Spacer(1, 24)]
-    tcs,cs=0,0
-    pbar = tqdm(total=len(chapter))
-    for title, idx in chapter.items():
-        if utils.check_redown(title, ozj):
-            tqdm.write(f'下载 {title}')
-            content, st = utils.down_text(idx)
-            time.sleep(random.randint(config.config['delay'][0], config.config['delay'][1]) / 1000)
-            tcs,cs=utils.update_save(st,tcs,cs,book_json_path,chapter)
-            story.append(PageBreak())
-            story.append(Paragraph(title, chapter_style))
-            story.append(Paragraph(content, content_style))
-        else:
-            chapter[title] = ozj[title]
-        pbar.update(1)
+    utils.down_chapters(chapter, ozj, book_json_path)
+    utils.finish_save(book_json_path, chapter)
 
-    utils.savejson(book_json_path, chapter)
+    for title, content in chapter.items():
+        story.append(PageBreak())
+        story.append(Paragraph(title, chapter_style))
+        story.append(Paragraph(content, content_style))
 
     # 保存为 PDF 文件
     doc.build(story)
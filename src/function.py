@@ -1,11 +1,10 @@
-import requests as req
 import platform,time,os
 from tqdm import tqdm
 from tkinter import Tk
 
 import init
 from down import book,epub,html,latex,pdf,markdown
-from utils import savejson,loadjson,select_save_directory
+from utils import savejson,save_records,select_save_directory
 import config
 
 def search() -> None:
@@ -15,7 +14,7 @@ def search() -> None:
         if key == '':
             return
         url = f"https://api5-normal-lf.fqnovel.com/reading/bookapi/search/page/v/?query={key}&aid=1967&channel=0&os_version=0&device_type=0&device_platform=0&iid=466614321180296&passback={{(page-1)*10}}&version_code=999"
-        response = req.get(url)
+        response = config.session.get(url)
         if response.status_code == 200:
             data = response.json()
             if data['code'] == 0:
@@ -49,10 +48,8 @@ def download(book_id:str) -> bool:
     if book_id[:4]=='http':
         book_id=book_id.split('?')[0].split('/')[-1]
     try:
-        records=loadjson(config.record_path)
-        if book_id not in records:
-            records.append(book_id)
-            savejson(config.record_path,records)
+        if book_id not in config.records:
+            config.records.append(book_id)
         match config.config['save_mode']:
             case 3:
                 success=epub.down_book_epub(book_id)
@@ -71,6 +68,8 @@ def download(book_id:str) -> bool:
             print('找不到此书')
             return False
         else:
+            # 每本书下载后立即写回记录，避免进程被直接关闭时丢失
+            save_records()
             print('下载完成')
             return True
     except ValueError:
@@ -79,12 +78,11 @@ def download(book_id:str) -> bool:
 
 
 def update() -> None:
-    records=loadjson(config.record_path)
-    for book_id in tqdm(records):
+    for book_id in tqdm(list(config.records)):
         ok=download(book_id)
         if not ok:
-            records.remove(book_id)
-    savejson(config.record_path,records)
+            config.records.remove(book_id)
+    save_records()
     print('更新完成')
 
 def get_input(prompt: str, default: str = '') -> str:
@@ -110,7 +108,7 @@ def update_save_mode() -> None:
             return
 
 def setting() -> None:
-    print('请选择项目：1.正文段首占位符 2.章节下载间隔延迟 3.小说保存路径 4.小说保存方式 5.重置配置文件')
+    print('请选择项目：1.正文段首占位符 2.章节下载间隔延迟 3.小说保存路径 4.小说保存方式 5.重置配置文件 6.下载线程数')
     inp2 = input()
 
     match inp2:
@@ -129,6 +127,8 @@ def setting() -> None:
         case '5':
             os.removedirs(config.config_path)
             init.init_config()
+        case '6':
+            config.config['xc'] = max(1, int(get_input(f'请输入下载线程数（当前为{config.config["xc"]}）：', str(config.config['xc']))))
         case _:
             print('请正确输入!')
             return
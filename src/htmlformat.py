@@ -40,12 +40,11 @@ def get_toc_content(chapter: dict[str,str]) -> str:
     return toc_content
 
 
-def get_chapter_htmlcontent(title: str,chapter_content: str,chapter: dict[str,str]) -> str:
+def get_chapter_htmlcontent(title: str,chapter_content: str,next_title: str='') -> str:
     formatted_content=chapter_content.replace('\n','<br/>')
     next_chapter_button=""
-    if len(chapter)>list(chapter.keys()).index(title)+1:
-        next_chapter_key=list(chapter.keys())[list(chapter.keys()).index(title)+1]
-        next_chapter_button=f"<button onclick=\"location.href='{next_chapter_key}.html'\">下一章</button>"
+    if next_title:
+        next_chapter_button=f"<button onclick=\"location.href='{next_title}.html'\">下一章</button>"
     return f"""
 <html>
 <head>
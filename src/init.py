@@ -1,10 +1,9 @@
-import json,os,random
+import os,random
 import config,utils
 
 
 def ensure_dir_exists(path: str) -> None:
-    if not os.path.exists(path):
-        os.makedirs(path)
+    os.makedirs(path, exist_ok=True)
 
 def init_config() -> None:
     # 确保数据目录和书籍存储目录存在
@@ -16,22 +15,20 @@ def init_config() -> None:
     # 初始化 record 文件
     config.record_path = os.path.join(config.data_dir, 'record.json')
     if not os.path.exists(config.record_path):
-        with open(config.record_path, 'w', encoding='UTF-8') as f:
-            json.dump([], f)
+        utils.savejson(config.record_path, [])
+    config.records = utils.loadjson(config.record_path)
 
     config.cookie_path = os.path.join(config.data_dir, 'cookie.json')
 
     # 加载或初始化 config 文件
     config.config_path = os.path.join(config.data_dir, 'config.json')
     if os.path.exists(config.config_path):
-        with open(config.config_path, 'r', encoding='UTF-8') as f:
-            config.config = json.load(f)
+        config.config = utils.loadjson(config.config_path)
         # 只添加缺失的配置项
         config.config.update({k: v for k, v in config.default_config.items() if k not in config.config})
     else:
         config.config = config.default_config
-        with open(config.config_path, 'w', encoding='UTF-8') as f:
-            json.dump(config.default_config, f)
+        utils.savejson(config.config_path, config.default_config)
 
     # 设置保存路径
     config.save_path = os.path.join(config.script_dir, str(config.config['save_path']))
@@ -39,6 +36,7 @@ def init_config() -> None:
 
     # 随机选择请求头
     config.headers = random.choice(config.headers_lib)
+    config.session = utils.new_session()
 
     # 初始化 cookie
     init_cookie()
@@ -50,13 +48,14 @@ def init_cookie() -> None:
     print('modifyed by sstzer')
     print('正在获取cookie')
 
-    config.tzj=random.choice(list(utils.down_chapter('7143038691944959011')[1].values())[21:])
+    # 测试章节只需获取一次，重载配置时不再请求目录页
+    if not config.tzj:
+        config.tzj=random.choice(list(utils.down_chapter('7143038691944959011')[1].values())[21:])
 
     tmod=0
 
     if os.path.exists(config.cookie_path):
-        with open(config.cookie_path,'r',encoding='UTF-8') as f:
-            config.cookie=json.load(f)
+        config.cookie=utils.loadjson(config.cookie_path)
         tmod=1
 
     if tmod==0 or not utils.get_cookie(config.tzj,config.cookie):
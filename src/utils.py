@@ -1,34 +1,45 @@
-import random,time,json,os
+import random,time,os,functools
+import asyncio,threading,queue
 from tkinter import Tk,filedialog
+import aiohttp
+from aiolimiter import AsyncLimiter
 import requests as req
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from lxml import etree
+from tqdm import tqdm
+import orjson
 
 import config
 
+_XP_CHAPTERS=etree.XPath('//div[@class="chapter"]/div/a',smart_strings=False)
+_XP_TITLE=etree.XPath('//h1/text()',smart_strings=False)
+_XP_STATUS=etree.XPath('//span[@class="info-label-yellow"]/text()',smart_strings=False)
+_XP_READER=etree.XPath('//div[@class="muye-reader-content noselect"]//p/text()',smart_strings=False)
+_local=threading.local()
+RETRY=Retry(total=3,backoff_factor=0.5,status_forcelist=(429,500,502,503,504),allowed_methods=frozenset(['GET']))
+
+_ILLEGAL_CHARS=str.maketrans('<>:"/\\|?*','＜＞：＂／＼｜？＊')
+
+@functools.lru_cache(maxsize=4096)
 def sanitize_filename(filename: str) -> str:
-    illegal_chars=['<','>',':','"','/','\\','|','?','*']
-    illegal_chars_rep=['＜','＞','：','＂','／','＼','｜','？','＊']
-    for i in range(len(illegal_chars)):
-        filename=filename.replace(illegal_chars[i],illegal_chars_rep[i])
-    return filename
+    return filename.translate(_ILLEGAL_CHARS)
 
 
-def interpreter(uni: int,mode: int) -> str:
-    bias=uni-config.CODE[mode][0]
-    if bias<0 or bias>=len(config.charset[mode]) or config.charset[mode][bias]=='?':
-        return chr(uni)
-    return config.charset[mode][bias]
+# 字体反爬映射表，按 mode 预先构建，供 str.translate 使用
+_TRANS=[{config.CODE[mode][0]+i:c for i,c in enumerate(config.charset[mode]) if c!='?'} for mode in range(len(config.CODE))]
 
 
 def str_interpreter(n: str,mode: int) -> str:
-    s=''
-    for i in range(len(n)):
-        uni=ord(n[i])
-        if config.CODE[mode][0]<=uni<=config.CODE[mode][1]:
-            s+=interpreter(uni,mode)
-        else:
-            s+=n[i]
-    return s
+    return n.translate(_TRANS[mode])
+
+
+def html_parser() -> etree.HTMLParser:
+    # lxml 解析器不能跨线程共享，每个线程复用自己的一个
+    parser=getattr(_local,'parser',None)
+    if parser is None:
+        parser=_local.parser=etree.HTMLParser(encoding='utf-8',huge_tree=True,recover=True,collect_ids=False,no_network=True)
+    return parser
 
 
 def select_save_directory() -> str:
@@ -37,15 +48,27 @@ def select_save_directory() -> str:
     return filedialog.askdirectory(title='请选择保存小说的文件夹')
 
 
+def new_session() -> req.Session:
+    # 复用连接，避免每章重新握手
+    session=req.Session()
+    adapter=HTTPAdapter(pool_connections=64,pool_maxsize=64,max_retries=RETRY)
+    session.mount('https://',adapter)
+    return session
+
+
 def loadjson(path: str) -> [dict]:
-    with open(path,'r',encoding='UTF-8') as f:
-        file=json.load(f)
+    with open(path,'rb') as f:
+        file=orjson.loads(f.read())
     return file
 
 
 def savejson(path: str,file: dict) -> None:
-    with open(path,'w',encoding='UTF-8') as f:
-        json.dump(file,f,ensure_ascii=False)
+    with open(path,'wb') as f:
+        f.write(orjson.dumps(file))
+
+
+def save_records() -> None:
+    savejson(config.record_path,config.records)
 
 
 def down_init(it: str) -> tuple[dict,dict[str,str],str]:
@@ -57,11 +80,21 @@ def down_init(it: str) -> tuple[dict,dict[str,str],str]:
     print('\n开始下载《%s》，状态‘%s’'%(name,status))
     book_json_path=os.path.join(config.bookstore_dir,name+'.json')
 
-    if os.path.exists(book_json_path):
-        with open(book_json_path,'r',encoding='UTF-8') as json_file:
-            ozj=json.load(json_file)
-    else:
+    try:
+        ozj=loadjson(book_json_path)
+    except FileNotFoundError:
         ozj={}
+    # 合并上次中断时追加写入的章节
+    try:
+        with open(checkpoint_path(book_json_path),'rb') as f:
+            for line in f:
+                # 中断时可能留下写了一半的行，跳过后这些章节会重新下载
+                try:
+                    ozj.update(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
     return ozj,zj,name
 
 
@@ -69,24 +102,27 @@ def check_redown(title: str,ozj: dict) -> bool:
     if title in ozj:
         try:
             int(ozj[title])
-            return False
-        except ValueError:
             return True
+        except ValueError:
+            return not ozj[title]
     return True
 
 
+def checkpoint_path(book_json_path: str) -> str:
+    return os.path.splitext(book_json_path)[0]+'.chapters.jsonl'
+
+
 def get_cookie(chapter: str,t: str='') -> bool:
     bas=1000000000000000000
     if not t:
         for i in range(random.randint(bas*6,bas*8),bas*9):
             time.sleep(random.randint(50,150)/1000)
             config.cookie='novel_web_id='+str(i)
-            if len(down_text(chapter,2)[0])>200:
-                with open(config.cookie_path,'w',encoding='UTF-8') as f:
-                    json.dump(config.cookie,f)
+            if len(down_text(chapter))>200:
+                savejson(config.cookie_path,config.cookie)
                 return True
     else:
-        if len(down_text(chapter,2)[0])>200:
+        if len(down_text(chapter))>200:
             config.cookit=t
             return True
         else:
@@ -97,58 +133,144 @@ def down_chapter(it: str)->tuple[str,dict[str,str],list[str]]:
 
     an:dict[str:str]={}
 
-    ele=etree.HTML(req.get('https://fanqienovel.com/page/'+it,headers=config.headers).text)
-    a=ele.xpath('//div[@class="chapter"]/div/a')
-    for t in a:
-        an[t.text]=t.xpath('@href')[0].split('/')[-1]
-    if not ele.xpath('//h1/text()'):
+    ele=etree.fromstring(config.session.get('https://fanqienovel.com/page/'+it,headers=config.headers).content,html_parser())
+    for t in _XP_CHAPTERS(ele):
+        an[t.text]=t.get('href').split('/')[-1]
+    title=_XP_TITLE(ele)
+    if not title:
         return '',{},[]
-    return ele.xpath('//h1/text()')[0],an,ele.xpath('//span[@class="info-label-yellow"]/text()')
+    return title[0],an,_XP_STATUS(ele)
 
 
-def update_save(st:int,tcs:int,cs:int,book_json_path:str,chapter:dict)->tuple[int,int]:
+async def update_save(st:int,tcs:int,write_q:queue.Queue,title:str,content:str)->int:
     if st:
         tcs += 1
         if tcs > 7:
             tcs = 0
-            get_cookie(config.tzj)
-    cs += 1
-    if cs >= 5:
-        cs = 0
-        savejson(book_json_path, chapter)
-    return tcs,cs
-
-def down_text(idx:str,mod:int=1) -> tuple[str,bool]:
-    headers2=config.headers
-    headers2['cookie']=config.cookie
-    f=False
-    while True:
-        try:
-            res=req.get('https://fanqienovel.com/reader/'+idx,headers=headers2)
-            n = '\n'.join(etree.HTML(res.text).xpath('//div[@class="muye-reader-content noselect"]//p/text()'))
+            # get_cookie 会阻塞很久，放到线程里执行，避免卡住其他请求
+            await asyncio.to_thread(get_cookie,config.tzj)
+    write_q.put_nowait((title,content))
+    return tcs
+
+
+def start_writer(book_json_path:str)->tuple[queue.Queue,threading.Thread]:
+    write_q=queue.Queue()
+    writer=threading.Thread(target=writer_loop,args=(write_q,checkpoint_path(book_json_path)),daemon=True)
+    writer.start()
+    return write_q,writer
+
+
+def writer_loop(write_q:queue.Queue,chapters_path:str)->None:
+    # 只追加新下载的章节，避免每次重写整本书；写盘在后台线程进行
+    with open(chapters_path,'ab') as f:
+        while (item:=write_q.get()) is not None:
+            f.write(orjson.dumps({item[0]:item[1]})+b'\n')
+            f.flush()
+
+
+def finish_save(book_json_path:str,chapter:dict)->None:
+    savejson(book_json_path,chapter)
+    try:
+        os.remove(checkpoint_path(book_json_path))
+    except FileNotFoundError:
+        pass
+
+def down_chapters(chapter:dict[str,str],ozj:dict,book_json_path:str)->None:
+    todo:dict[str,str]={}
+    for title,idx in chapter.items():
+        if check_redown(title,ozj):
+            todo[title]=idx
+        else:
+            chapter[title]=ozj[title]
+    # 已有内容都已并入 chapter，释放旧字典（含目录里已不存在的章节）
+    ozj.clear()
+    asyncio.run(adown_chapters(chapter,todo,book_json_path))
+    decode_chapters(chapter)
+
+
+def decode_chapters(chapter:dict[str,str])->None:
+    # 整本书拼接后只做一次 translate；解码结果不在映射范围内，已解码的章节不受影响
+    texts=str_interpreter('\x00'.join(chapter.values()),0).split('\x00')
+    chapter.update(zip(list(chapter),texts))
+
+
+async def adown_chapters(chapter:dict[str,str],todo:dict[str,str],book_json_path:str)->None:
+    # config.json 可手动编辑，并发数至少为 1
+    xc=max(1,int(config.config['xc']))
+    sem=asyncio.Semaphore(xc)
+    connector=aiohttp.TCPConnector(limit=xc,ttl_dns_cache=300)
+    timeout=aiohttp.ClientTimeout(total=10)
+    # 所有任务共用一个令牌桶，每个平均下载间隔发放一个令牌
+    delay=(config.config['delay'][0]+config.config['delay'][1])/2
+    limiter=AsyncLimiter(1,max(delay,1)/1000)
+    tcs=0
+    failed:list[str]=[]
+    write_q,writer=start_writer(book_json_path)
+    pbar=tqdm(total=len(chapter),initial=len(chapter)-len(todo))
+    try:
+        # 不保存响应中的 Set-Cookie，始终只发送 config.cookie
+        async with aiohttp.ClientSession(connector=connector,timeout=timeout,cookie_jar=aiohttp.DummyCookieJar()) as session:
+            tasks=[asyncio.create_task(afetch_chapter(session,sem,limiter,title,idx)) for title,idx in todo.items()]
+            for task in asyncio.as_completed(tasks):
+                title,chapter[title],st=await task
+                tcs=await update_save(st,tcs,write_q,title,chapter[title])
+                if chapter[title]:
+                    tqdm.write(f'下载 {title}')
+                else:
+                    failed.append(title)
+                    tqdm.write(f'下载失败 {title}')
+                pbar.update(1)
+    finally:
+        pbar.close()
+        write_q.put(None)
+        writer.join()
+    if failed:
+        # 失败的章节在输出中为空，提示用户重新下载以补全
+        print(f'警告：以下{len(failed)}章多次重试后仍下载失败，内容为空，重新下载本书即可补全：')
+        for title in failed:
+            print('  '+title)
+
+
+async def afetch_chapter(session:aiohttp.ClientSession,sem:asyncio.Semaphore,limiter:AsyncLimiter,title:str,idx:str)->tuple[str,str,bool]:
+    loop=asyncio.get_running_loop()
+    content,f='',True
+    async with sem:
+        # aiohttp 没有连接池级别的重试，按 RETRY 的次数、退避时间和状态码列表重试；
+        # 其他错误（如 403、404、解析失败）与 down_text 一样直接放弃
+        for attempt in range(RETRY.total+1):
+            if attempt:
+                await asyncio.sleep(RETRY.backoff_factor*2**(attempt-1))
+            await limiter.acquire()
+            try:
+                async with session.get('https://fanqienovel.com/reader/'+idx,headers={**config.headers,'cookie':config.cookie}) as res:
+                    if res.status in RETRY.status_forcelist:
+                        continue
+                    res.raise_for_status()
+                    page=await res.read()
+            except (aiohttp.ClientConnectionError,aiohttp.ClientPayloadError,asyncio.TimeoutError):
+                continue
+            except aiohttp.ClientError:
+                f=attempt>0
+                break
+            f=attempt>0
+            try:
+                # 解析放到线程池，避免阻塞事件循环；解码在全部下载后统一进行
+                content=await loop.run_in_executor(None,extract_text,page)
+            except Exception:
+                pass
             break
-        except:  # 捕获所有异常
-            if mod == 2:
-                return 'err',f
-            f = True
-            time.sleep(0.4)
-    if mod==1:
-        s=str_interpreter(n,0)
-    else:
-        s=n
+    return title,content,f
+
+
+def extract_text(page:bytes) -> str:
+    return '\n'.join(_XP_READER(etree.fromstring(page,html_parser())))
+
+
+def down_text(idx:str) -> str:
+    headers2={**config.headers,'cookie':config.cookie}
     try:
-        return s, f
-    except:
-        s=s[6:]
-        tmp=1
-        a=''
-        for i in s:
-            if i=='<':
-                tmp+=1
-            elif i=='>':
-                tmp-=1
-            elif tmp==0:
-                a+=i
-            elif tmp==1 and i=='p':
-                a=(a+'\n').replace('\n\n','\n')
-        return a,f
+        # 重试由 session 挂载的 RETRY 负责
+        res=config.session.get('https://fanqienovel.com/reader/'+idx,headers=headers2)
+        return extract_text(res.content)
+    except:  # 捕获所有异常
+        return 'err'